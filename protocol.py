@@ -0,0 +1,234 @@
+"""
+Protocolo de ajuste de infusión de insulina intravenosa de GEA GlucoFlow.
+
+Lógica pura (sin Streamlit) separada de la UI: Streamlit re-ejecuta app.py en cada
+interacción, pero este módulo se importa una sola vez por proceso, de modo que las
+tablas del protocolo y la caché de calculate_insulin_adjustment persisten entre
+re-ejecuciones. Al no depender de Streamlit, es candidato a compilación AOT en sitio
+(p. ej. `mypyc protocol.py`): un módulo de extensión junto a protocol.py tiene
+prioridad de importación sobre el fuente.
+"""
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from functools import lru_cache
+from math import inf, isnan, nextafter
+from typing import TypedDict, List, Tuple, Optional, Any, Final
+
+# --- Constantes ---
+GLUCOSE_TARGET_LOW_1: Final[float] = 75.0
+GLUCOSE_TARGET_LOW_2: Final[float] = 100.0
+GLUCOSE_TARGET_MID_1: Final[float] = 140.0
+GLUCOSE_TARGET_MID_2: Final[float] = 200.0
+PAUSE_DURATION_MINUTES: Final[int] = 30
+DELTA: Final[str] = "\u0394"
+
+# --- Estructuras de Datos ---
+class InsulinCalculatorFormData(TypedDict):
+    """Estructura para los datos de entrada del formulario."""
+    currentGlucose: float
+    previousGlucose: float
+    currentInsulinFlow: float
+
+@dataclass(slots=True, frozen=True)
+class InsulinRecommendation:
+    """Estructura inmutable para los datos de salida (la recomendación)."""
+    actionTitle: str
+    details: Tuple[str, ...]
+    newFlowRateInfo: str
+    originalFlowRateInfo: str
+    calculationSummary: Optional[str]
+    isCritical: bool
+    colorClass: str # ('success', 'info', 'warning', 'error')
+    icon: str # Emoji icon
+
+@dataclass(slots=True, frozen=True)
+class Deltas:
+    """Estructura inmutable para los valores delta de ajuste."""
+    delta1: float
+    delta2: float
+
+# --- Tablas Públicas del Protocolo ---
+# FLOW_THRESHOLDS, FLOW_DELTAS, ACTIONS, GLUCOSE_BREAKS y CHANGE_INDEX son API pública:
+# protocol_batch construye su versión vectorizada a partir de ellas.
+# Tabla de deltas por flujo: FLOW_DELTAS[i] aplica al tramo que bisect_right(FLOW_THRESHOLDS, flujo) devuelve
+FLOW_THRESHOLDS = (4.0, 6.5, 10.0, 15.0, 20.0, 25.0)
+FLOW_DELTAS = tuple(Deltas(d1, d2) for d1, d2 in ((0.5, 1.0), (1.0, 2.0), (1.5, 3.0), (2.0, 4.0), (3.0, 6.0), (4.0, 8.0), (5.0, 10.0)))
+
+# --- Tabla del Protocolo ---
+def _just_below(limit: float) -> float:
+    """Mayor float menor que `limit`; convierte límites `>=`/`<` en intervalos (lo, hi]."""
+    return nextafter(limit, -inf)
+
+# Acciones: (título, clave de delta, signo del ajuste, crítica, color, icono)
+_HOLD, _INC_1, _INC_2, _DEC_1, _PAUSE_2 = range(5)
+ACTIONS = (
+    ("CONTINUAR SIN CAMBIOS", None, 0, False, "success", "✅"),
+    ("AUMENTAR FLUJO (1 Delta)", "delta1", 1, False, "info", "⬆️"),
+    ("AUMENTAR FLUJO (2 Deltas)", "delta2", 1, False, "info", "⬆️⬆️"),
+    ("DISMINUIR FLUJO (1 Delta)", "delta1", -1, False, "info", "⬇️"),
+    (f"PAUSAR ({PAUSE_DURATION_MINUTES} min) Y AJUSTAR (2 Deltas)", "delta2", -1, True, "warning", "⏸️⬇️"),
+)
+# Plantillas str.format por acción: (detalles, nuevo flujo, sufijo del resumen)
+_INCREASE_TEMPLATES = (("{description} Aumentar {delta:.1f}.",), "Nuevo: {new_flow:.1f}", " " + DELTA + ": +{delta:.1f}.")
+_ACTION_TEMPLATES = (
+    (("{description}",), "Mantener: {flow:.1f}", ""),
+    _INCREASE_TEMPLATES, # 1 Delta
+    _INCREASE_TEMPLATES, # 2 Deltas
+    (("{description} Disminuir {delta:.1f}.",), "Nuevo: {new_flow:.1f}", " " + DELTA + ": -{delta:.1f}."),
+    (("{description}", f"Pausar {PAUSE_DURATION_MINUTES} min.", "Reanudar y disminuir {delta:.1f}."),
+     "Post-pausa: {new_flow:.1f}", " Pausa + " + DELTA + ": -{delta:.1f}."),
+)
+
+# Rangos de glucosa: índice = bisect_right(GLUCOSE_BREAKS, glucosa); 0 es hipoglucemia
+GLUCOSE_BREAKS = (GLUCOSE_TARGET_LOW_1, GLUCOSE_TARGET_LOW_2, GLUCOSE_TARGET_MID_1, GLUCOSE_TARGET_MID_2)
+_RANGE_LABELS: Tuple[str, ...] = (
+    "", # Hipoglucemia: no lleva etiqueta de rango
+    f" Rango: {GLUCOSE_TARGET_LOW_1:.0f}-{GLUCOSE_TARGET_LOW_2:.0f}.",
+    f" Rango: {GLUCOSE_TARGET_LOW_2:.0f}-{GLUCOSE_TARGET_MID_1:.0f}.",
+    f" Rango: {GLUCOSE_TARGET_MID_1:.0f}-{GLUCOSE_TARGET_MID_2:.0f}.",
+    f" Rango: >= {GLUCOSE_TARGET_MID_2:.0f}.",
+)
+# Textos de hipoglucemia con el umbral ya formateado; solo la glucosa actual varía por llamada
+_HYPO_DETAIL_TEMPLATE = f"Glucosa actual ({{current_glucose:.0f}}) < {GLUCOSE_TARGET_LOW_1}. CONSIDERAR SUSPENDER."
+_HYPO_NEW_FLOW_INFO = "Nuevo flujo sugerido: 0.0 cc/h (SUSPENDER)"
+# Reglas por rango: (lo, hi, acción, descripción); aplica si lo < cambio de glucosa <= hi.
+# Los intervalos no se solapan, así que el orden de las filas es solo de lectura.
+# Los huecos entre reglas son intencionales y caen en "Revisar Datos/Protocolo".
+_RULES_BY_GLUCOSE = (
+    (),
+    (   # 75-99
+        (0.0, inf, _HOLD, "Glucosa 75-99 y subiendo."),
+        (-25.0, 0.0, _DEC_1, "Glucosa 75-99, estable o descenso < 25."),
+        (-inf, -25.0, _PAUSE_2, "Glucosa 75-99, descenso >= 25."),
+    ),
+    (   # 100-139
+        (-25.0, 25.0, _HOLD, "Glucosa 100-139, cambio -25 a +25."),
+        (25.0, inf, _INC_1, "Glucosa 100-139, aumento > 25."),
+        (_just_below(-50.0), -26.0, _DEC_1, "Glucosa 100-139, descenso 26-50."),
+        (-inf, _just_below(-50.0), _PAUSE_2, "Glucosa 100-139, descenso > 50."),
+    ),
+    (   # 140-199
+        (-49.0, _just_below(0.0), _HOLD, "Glucosa 140-199, descenso < 50."),
+        (_just_below(0.0), 50.0, _INC_1, "Glucosa 140-199, aumento <= 50 o estable."),
+        (50.0, inf, _INC_2, "Glucosa 140-199, aumento > 50."),
+        (_just_below(-75.0), -50.0, _DEC_1, "Glucosa 140-199, descenso 50-75."),
+        (-inf, _just_below(-75.0), _PAUSE_2, "Glucosa 140-199, descenso > 75."),
+    ),
+    (   # >= 200
+        (_just_below(-75.0), -25.0, _HOLD, "Glucosa >= 200, descenso 25-75."),
+        (-24.0, 0.0, _INC_1, "Glucosa >= 200, estable o descenso < 25."),
+        (0.0, inf, _INC_2, "Glucosa >= 200 y subiendo."),
+        (_just_below(-100.0), _just_below(-75.0), _DEC_1, "Glucosa >= 200, descenso 75-100."),
+        (-inf, _just_below(-100.0), _PAUSE_2, "Glucosa >= 200, descenso > 100."),
+    ),
+)
+
+def _index_rules(rules: Tuple[Tuple[Any, ...], ...]) -> Tuple[Tuple[float, ...], Tuple[Any, ...]]:
+    """
+    Convierte las reglas de un rango en límites superiores ordenados para bisect_left,
+    de modo que outcomes[bisect_left(breaks, cambio)] es la (acción, descripción) que
+    aplica, o None si el cambio cae en un hueco del protocolo.
+    """
+    breaks: List[float] = []
+    outcomes: List[Any] = []
+    previous_hi = -inf
+    for lo, hi, action, description in sorted(rules, key=lambda rule: rule[1]):
+        if lo != previous_hi:
+            breaks.append(lo); outcomes.append(None)
+        breaks.append(hi); outcomes.append((action, description))
+        previous_hi = hi
+    return tuple(breaks), tuple(outcomes)
+
+CHANGE_INDEX = tuple(_index_rules(rules) for rules in _RULES_BY_GLUCOSE)
+
+# --- Lógica de Cálculo ---
+def get_deltas(current_flow: float) -> Deltas:
+    """
+    Calcula los valores delta (delta1, delta2) para el ajuste de insulina
+    basados en el flujo actual (cc/h) mediante búsqueda binaria en la tabla de tramos.
+
+    Args:
+        current_flow: El flujo actual de insulina en cc/h.
+
+    Returns:
+        Una instancia Deltas (compartida, inmutable) con los valores de delta1 y delta2.
+    """
+    return FLOW_DELTAS[bisect_right(FLOW_THRESHOLDS, current_flow)]
+
+def calculate_insulin_adjustment(data: InsulinCalculatorFormData) -> InsulinRecommendation:
+    """
+    Calcula la recomendación de ajuste de insulina basada en los datos proporcionados,
+    siguiendo un protocolo clínico específico.
+
+    Args:
+        data: Un diccionario tipo InsulinCalculatorFormData con los datos del paciente.
+
+    Returns:
+        Una instancia inmutable de InsulinRecommendation con la sugerencia de ajuste.
+
+    Raises:
+        ValueError: Si las glucosas no son positivas o el flujo es negativo. Solo se
+            comprueba en modo depuración; con `python -O` la guarda son los widgets.
+    """
+    return _calculate_cached(data['currentGlucose'], data['previousGlucose'], data['currentInsulinFlow'])
+
+@lru_cache(maxsize=512)
+def _calculate_cached(current_glucose: float, previous_glucose: float, current_insulin_flow: float) -> InsulinRecommendation:
+    """
+    Implementación del protocolo, memoizada sobre la terna exacta de entradas.
+    Streamlit re-ejecuta el script en cada interacción, así que entradas repetidas
+    devuelven el resultado ya calculado.
+    """
+    # --- Validación de Entrada Básica ---
+    # Se elimina con `python -O`: en producción los min_value de los widgets garantizan la entrada
+    if __debug__ and not (current_glucose > 0 and previous_glucose > 0 and current_insulin_flow >= 0):
+        raise ValueError("Verifique que los valores de glucosa sean positivos (> 0) y el flujo de insulina sea no negativo (>= 0).")
+
+    # --- Inicialización ---
+    glucose_change = current_glucose - previous_glucose
+    deltas = get_deltas(current_insulin_flow) # No puede fallar: bisect sobre una tabla constante
+
+    # Valores por defecto
+    action_title = "Revisar Datos/Protocolo"
+    details: Tuple[str, ...] = ("Los valores ingresados no generaron una recomendación estándar. Verifique los datos o consulte el protocolo clínico.",)
+    new_flow = current_insulin_flow # Mantener flujo por defecto
+    is_critical = False
+    color_class = "warning" # Default to warning if no rule matches
+    icon = "❓"
+    original_flow_rate_info = f"Flujo actual: {current_insulin_flow:.1f} cc/h"
+    new_flow_rate_info = f"Mantener flujo: {current_insulin_flow:.1f} cc/h" # Default message
+    calculation_summary = f"Cambio de glucosa: {glucose_change:+.0f} mg/dL ({previous_glucose:.0f} -> {current_glucose:.0f} mg/dL)."
+
+    # --- Lógica Principal del Protocolo ---
+    range_index = bisect_right(GLUCOSE_BREAKS, current_glucose)
+    if range_index:
+        calculation_summary += _RANGE_LABELS[range_index]
+        change_breaks, change_outcomes = CHANGE_INDEX[range_index]
+        outcome = change_outcomes[bisect_left(change_breaks, glucose_change)]
+        # Descartar NaN (inf - inf), que bisect ubicaría en la primera regla
+        if outcome is not None and not isnan(glucose_change):
+            action, description = outcome
+            action_title, delta_key, sign, is_critical, color_class, icon = ACTIONS[action]
+            details_templates, new_flow_template, summary_template = _ACTION_TEMPLATES[action]
+            delta = getattr(deltas, delta_key) if delta_key else 0.0
+            new_flow = current_insulin_flow + sign * delta
+            new_flow = new_flow if new_flow > 0.0 else 0.0 # El flujo no puede ser negativo
+            fields = {"description": description, "delta": delta, "flow": current_insulin_flow, "new_flow": new_flow}
+            details = tuple(template.format_map(fields) for template in details_templates)
+            new_flow_rate_info = new_flow_template.format_map(fields)
+            calculation_summary += summary_template.format_map(fields)
+    else:
+        # Hipoglucemia (< 75)
+        action_title = "¡HIPOGLUCEMIA!"
+        details = (_HYPO_DETAIL_TEMPLATE.format(current_glucose=current_glucose), "Administrar carbohidratos según protocolo.", "Evaluar causa.")
+        new_flow = 0.0
+        new_flow_rate_info = _HYPO_NEW_FLOW_INFO
+        calculation_summary += " Suspensión sugerida por hipoglucemia."
+        is_critical = True; color_class = "error"; icon = "🚨"
+
+    # --- Construcción Final del Resultado ---
+    return InsulinRecommendation(
+        actionTitle=action_title, details=details, newFlowRateInfo=new_flow_rate_info,
+        originalFlowRateInfo=original_flow_rate_info, calculationSummary=calculation_summary,
+        isCritical=is_critical, colorClass=color_class, icon=icon
+    )
@@ -0,0 +1,97 @@
+"""
+Versión vectorizada del protocolo de GEA GlucoFlow para procesar muchas lecturas a la vez
+(p. ej. un CSV de glucometrías históricas).
+
+Reutiliza las tablas de protocol.py, de modo que ambas versiones aplican exactamente las
+mismas reglas; la UI de un solo paciente sigue usando calculate_insulin_adjustment.
+Se mantiene en un módulo aparte para que protocol.py no dependa de NumPy.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+from numpy.typing import ArrayLike
+
+from protocol import ACTIONS, CHANGE_INDEX, FLOW_DELTAS, FLOW_THRESHOLDS, GLUCOSE_BREAKS
+
+# --- Códigos de Resultado ---
+# 0..4 son los índices de las acciones de protocol.ACTIONS; luego los casos especiales
+HYPOGLYCEMIA = len(ACTIONS)
+REVIEW = len(ACTIONS) + 1 # Cambio de glucosa en un hueco del protocolo ("Revisar Datos/Protocolo")
+INVALID = len(ACTIONS) + 2 # Datos de entrada no válidos ("ERROR EN DATOS")
+
+# --- Tablas Vectorizadas (indexadas por código de resultado) ---
+_OUTCOME_TITLES = np.array([action[0] for action in ACTIONS] + ["¡HIPOGLUCEMIA!", "Revisar Datos/Protocolo", "ERROR EN DATOS"], dtype=object)
+_OUTCOME_CRITICAL = np.array([action[3] for action in ACTIONS] + [True, False, True], dtype=bool)
+_OUTCOME_COLORS = np.array([action[4] for action in ACTIONS] + ["error", "warning", "error"], dtype=object)
+_OUTCOME_SIGNS = np.array([action[2] for action in ACTIONS] + [0, 0, 0], dtype=np.float64)
+_OUTCOME_USES_DELTA2 = np.array([action[1] == "delta2" for action in ACTIONS] + [False, False, False], dtype=bool)
+
+_GLUCOSE_BREAKS_ARRAY = np.array(GLUCOSE_BREAKS, dtype=np.float64)
+_FLOW_THRESHOLDS_ARRAY = np.array(FLOW_THRESHOLDS, dtype=np.float64)
+_DELTA1_ARRAY = np.array([deltas.delta1 for deltas in FLOW_DELTAS], dtype=np.float64)
+_DELTA2_ARRAY = np.array([deltas.delta2 for deltas in FLOW_DELTAS], dtype=np.float64)
+# Por rango de glucosa: (límites superiores del cambio, código de resultado de cada intervalo)
+_CHANGE_TABLES = tuple(
+    (np.array(breaks, dtype=np.float64),
+     np.array([REVIEW if outcome is None else outcome[0] for outcome in outcomes], dtype=np.intp))
+    for breaks, outcomes in CHANGE_INDEX
+)
+
+# --- Estructuras de Datos ---
+@dataclass(frozen=True)
+class InsulinAdjustmentBatch:
+    """Resultado vectorizado del protocolo: un elemento por lectura en cada arreglo."""
+    outcome: np.ndarray # Código de resultado (índice de acción, HYPOGLYCEMIA, REVIEW o INVALID)
+    newFlow: np.ndarray # Flujo sugerido en cc/h (post-pausa en las pausas); NaN si INVALID
+    actionTitle: np.ndarray
+    isCritical: np.ndarray
+    colorClass: np.ndarray
+
+# --- Lógica de Cálculo ---
+def calculate_insulin_adjustment_batch(current_glucose: ArrayLike, previous_glucose: ArrayLike,
+                                       current_insulin_flow: ArrayLike) -> InsulinAdjustmentBatch:
+    """
+    Aplica el protocolo de ajuste de insulina a muchas lecturas a la vez.
+
+    Args:
+        current_glucose: Glucometrías actuales (mg/dL).
+        previous_glucose: Glucometrías previas (mg/dL).
+        current_insulin_flow: Flujos actuales de insulina (cc/h).
+        Los tres argumentos deben ser difundibles (broadcast) a una misma forma.
+
+    Returns:
+        Un InsulinAdjustmentBatch con la acción y el flujo sugerido para cada lectura,
+        coherente con calculate_insulin_adjustment aplicado fila por fila.
+    """
+    current_glucose, previous_glucose, current_insulin_flow = np.broadcast_arrays(
+        np.atleast_1d(np.asarray(current_glucose, dtype=np.float64)),
+        np.atleast_1d(np.asarray(previous_glucose, dtype=np.float64)),
+        np.atleast_1d(np.asarray(current_insulin_flow, dtype=np.float64)),
+    )
+    with np.errstate(invalid="ignore"): # inf - inf da NaN, que se trata como REVIEW
+        glucose_change = current_glucose - previous_glucose
+
+    # Rango de glucosa (0 = hipoglucemia) y regla según el cambio dentro de cada rango
+    range_index = np.searchsorted(_GLUCOSE_BREAKS_ARRAY, current_glucose, side="right")
+    outcome = np.full(current_glucose.shape, HYPOGLYCEMIA, dtype=np.intp)
+    for index in range(1, len(_CHANGE_TABLES)):
+        in_range = range_index == index
+        if not in_range.any():
+            continue
+        change_breaks, change_codes = _CHANGE_TABLES[index]
+        positions = np.searchsorted(change_breaks, glucose_change[in_range], side="left")
+        outcome[in_range] = change_codes[np.minimum(positions, len(change_codes) - 1)]
+    outcome[np.isnan(glucose_change) & (range_index > 0)] = REVIEW
+    outcome[~((current_glucose > 0) & (previous_glucose > 0) & (current_insulin_flow >= 0))] = INVALID
+
+    # Delta según el tramo de flujo y ajuste con el signo de cada acción
+    flow_index = np.searchsorted(_FLOW_THRESHOLDS_ARRAY, current_insulin_flow, side="right")
+    delta = np.where(_OUTCOME_USES_DELTA2[outcome], _DELTA2_ARRAY[flow_index], _DELTA1_ARRAY[flow_index])
+    new_flow = np.maximum(current_insulin_flow + _OUTCOME_SIGNS[outcome] * delta, 0.0)
+    new_flow[outcome == HYPOGLYCEMIA] = 0.0
+    new_flow[outcome == INVALID] = np.nan
+
+    return InsulinAdjustmentBatch(
+        outcome=outcome, newFlow=new_flow, actionTitle=_OUTCOME_TITLES[outcome],
+        isCritical=_OUTCOME_CRITICAL[outcome], colorClass=_OUTCOME_COLORS[outcome]
+    )
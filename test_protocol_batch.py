@@ -0,0 +1,60 @@
+"""
+Paridad entre protocol_batch y el protocolo escalar de protocol.py.
+
+protocol_batch reconstruye sus tablas a partir de las tablas privadas de protocol.py;
+esta prueba detecta cualquier divergencia si esas tablas cambian.
+"""
+import itertools
+import re
+from math import inf
+
+from protocol import calculate_insulin_adjustment
+from protocol_batch import INVALID, REVIEW, calculate_insulin_adjustment_batch
+
+# Bordes de rango de glucosa y de las reglas de cambio, con vecinos fraccionarios
+GLUCOSE_VALUES = (50.0, 74.0, 74.5, 75.0, 99.0, 99.5, 100.0, 139.0, 140.0, 199.0, 199.5, 200.0, 400.0)
+CHANGE_VALUES = (-150.0, -101.0, -100.5, -100.0, -99.0, -76.0, -75.5, -75.0, -74.0, -51.0, -50.5, -50.0,
+                 -49.5, -49.0, -48.0, -27.0, -26.0, -25.5, -25.0, -24.5, -24.0, -1.0, 0.0, 1.0,
+                 24.0, 25.0, 25.5, 26.0, 49.0, 50.0, 50.5, 51.0, 150.0)
+FLOW_VALUES = (0.0, 0.5, 3.9, 4.0, 6.5, 9.9, 10.0, 15.0, 20.0, 24.9, 25.0, 40.0)
+
+
+def _scalar_new_flow(new_flow_rate_info: str) -> str:
+    """Extrae el flujo sugerido (texto con un decimal) de newFlowRateInfo."""
+    match = re.search(r"\d+\.\d", new_flow_rate_info)
+    assert match is not None, new_flow_rate_info
+    return match.group(0)
+
+
+def test_batch_matches_scalar_protocol():
+    rows = [(glucose, glucose - change, flow)
+            for glucose, change, flow in itertools.product(GLUCOSE_VALUES, CHANGE_VALUES, FLOW_VALUES)]
+    batch = calculate_insulin_adjustment_batch(*zip(*rows))
+
+    for index, (glucose, previous, flow) in enumerate(rows):
+        context = (glucose, previous, flow)
+        try:
+            scalar = calculate_insulin_adjustment(
+                {"currentGlucose": glucose, "previousGlucose": previous, "currentInsulinFlow": flow})
+        except ValueError:
+            assert batch.outcome[index] == INVALID, context
+            continue
+        assert batch.actionTitle[index] == scalar.actionTitle, context
+        assert bool(batch.isCritical[index]) == scalar.isCritical, context
+        assert batch.colorClass[index] == scalar.colorClass, context
+        assert f"{batch.newFlow[index]:.1f}" == _scalar_new_flow(scalar.newFlowRateInfo), context
+
+
+def test_nan_change_falls_through_to_review():
+    scalar = calculate_insulin_adjustment({"currentGlucose": inf, "previousGlucose": inf, "currentInsulinFlow": 5.0})
+    batch = calculate_insulin_adjustment_batch(inf, inf, 5.0)
+    assert batch.outcome[0] == REVIEW
+    assert batch.actionTitle[0] == scalar.actionTitle == "Revisar Datos/Protocolo"
+    assert batch.newFlow[0] == 5.0
+
+
+def test_invalid_input_is_flagged():
+    batch = calculate_insulin_adjustment_batch([0.0, 120.0, 120.0], [120.0, -1.0, 120.0], [5.0, 5.0, -0.1])
+    assert (batch.outcome == INVALID).all()
+    assert (batch.actionTitle == "ERROR EN DATOS").all()
+    assert batch.isCritical.all()